@@ -5,10 +5,14 @@ Helps set up app icons from the ../logo/AppIcons/ directory
 Can also generate missing icon sizes from a 1024x1024 source image
 """
 
+import argparse
+import hashlib
 import os
 import sys
 import shutil
 import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Try to import PIL for image processing
@@ -18,51 +22,106 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
-# ANSI color codes
-RED = '\033[0;31m'
-GREEN = '\033[0;32m'
-YELLOW = '\033[1;33m'
-BLUE = '\033[0;34m'
-NC = '\033[0m'  # No Color
-
-def print_colored(text, color):
-    """Print colored text"""
-    print(f"{color}{text}{NC}")
+# ANSI color codes, disabled when output is not a terminal (e.g. CI logs)
+if sys.stdout.isatty():
+    RED = '\033[0;31m'
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    BLUE = '\033[0;34m'
+    NC = '\033[0m'  # No Color
+else:
+    RED = GREEN = YELLOW = BLUE = NC = ''
+
+# Prebuilt message prefixes and suffix for the print helpers
+SUCCESS_PREFIX = f"{GREEN}✓ "
+ERROR_PREFIX = f"{RED}✗ "
+WARNING_PREFIX = f"{YELLOW}⚠ "
+INFO_PREFIX = f"{BLUE}ℹ "
+LINE_END = f"{NC}\n"
+
+def print_colored(text, prefix):
+    """Print text after a prebuilt color prefix, resetting the color at the end"""
+    sys.stdout.write(prefix + text + LINE_END)
 
 def print_success(text):
-    print_colored(f"✓ {text}", GREEN)
+    print_colored(text, SUCCESS_PREFIX)
 
 def print_error(text):
-    print_colored(f"✗ {text}", RED)
+    print_colored(text, ERROR_PREFIX)
 
 def print_warning(text):
-    print_colored(f"⚠ {text}", YELLOW)
+    print_colored(text, WARNING_PREFIX)
 
 def print_info(text):
-    print_colored(f"ℹ {text}", BLUE)
+    print_colored(text, INFO_PREFIX)
+
+# Interactive menu entries mapped to --mode values
+MENU_CHOICES = {
+    "1": "single",
+    "2": "multi",
+    "3": "auto",
+    "4": "generate",
+}
+
+# Generated sizes reused as resampling sources for the smaller icon clusters
+ICON_ANCHORS = (180,)
+
+# Bump whenever the way icons are generated changes, to invalidate .cache.json
+CACHE_VERSION = 1
+
+# Image modes supported by Image.reduce; others (e.g. P, I;16) go through resize
+REDUCE_MODES = {"L", "LA", "RGB", "RGBA"}
+
+DEFAULT_SOURCE_DIR = Path("../logo/AppIcons")
+DEFAULT_OUT_DIR = Path("Assets.xcassets/AppIcon.appiconset")
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Set up TobogganApp icons")
+    parser.add_argument(
+        "--mode",
+        choices=list(MENU_CHOICES.values()),
+        help="setup method; prompts interactively when omitted",
+    )
+    parser.add_argument(
+        "--source-dir",
+        type=Path,
+        default=DEFAULT_SOURCE_DIR,
+        help=f"directory containing the source icons (default: {DEFAULT_SOURCE_DIR})",
+    )
+    parser.add_argument(
+        "--out-dir",
+        type=Path,
+        default=DEFAULT_OUT_DIR,
+        help=f"AppIcon.appiconset directory to populate (default: {DEFAULT_OUT_DIR})",
+    )
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+
     print(f"{BLUE}🎨 TobogganApp Icon Setup Script{NC}")
     print("=" * 40)
     print()
 
-    # Check current directory
-    if not Path("TobogganAppApp.swift").exists():
+    # Default paths are relative to the TobogganApp source directory
+    uses_default_paths = args.source_dir == DEFAULT_SOURCE_DIR or args.out_dir == DEFAULT_OUT_DIR
+    if uses_default_paths and not Path("TobogganAppApp.swift").exists():
         print_error("This script must be run from the TobogganApp source directory")
         print(f"Current directory: {os.getcwd()}")
         sys.exit(1)
 
     # Define paths
-    logo_dir = Path("../logo/AppIcons")
-    assets_dir = Path("Assets.xcassets")
-    appicon_dir = assets_dir / "AppIcon.appiconset"
+    logo_dir = args.source_dir
+    appicon_dir = args.out_dir
+    assets_dir = appicon_dir.parent
 
     print_info("Checking directories...")
 
     # Check if logo directory exists
     if not logo_dir.exists():
         print_error(f"Logo directory not found at: {logo_dir}")
-        print("Please ensure your icon files are in the ../logo/AppIcons/ directory")
+        print(f"Please ensure your icon files are in the {logo_dir}/ directory")
         sys.exit(1)
 
     print_success(f"Found logo directory: {logo_dir}")
@@ -70,52 +129,62 @@ def main():
     # List files in logo directory
     print()
     print("📋 Files in logo directory:")
-    for file in sorted(logo_dir.glob("*")):
-        if file.is_file():
-            size = file.stat().st_size / 1024  # KB
-            print(f"  - {file.name} ({size:.1f} KB)")
+    with os.scandir(logo_dir) as entries:
+        files = sorted((entry for entry in entries if entry.is_file()), key=lambda entry: entry.name)
+    for entry in files:
+        size = entry.stat().st_size / 1024  # KB
+        print(f"  - {entry.name} ({size:.1f} KB)")
     print()
 
     # Create Assets.xcassets if it doesn't exist
     if not assets_dir.exists():
-        print_warning("Assets.xcassets not found. Creating it...")
+        print_warning(f"{assets_dir} not found. Creating it...")
         assets_dir.mkdir(parents=True)
 
     # Create AppIcon.appiconset directory
-    print_info("Setting up AppIcon.appiconset...")
+    print_info(f"Setting up {appicon_dir.name}...")
     appicon_dir.mkdir(parents=True, exist_ok=True)
 
-    # Required icon sizes
+    # Required icon sizes, each written once even when used by several slots
     ICON_SIZES = {
-        40: "20@2x (Notification)",
-        60: "20@3x (Notification)",
-        58: "29@2x (Settings)",
-        87: "29@3x (Settings)",
-        80: "40@2x (Spotlight)",
-        120: "40@3x (Spotlight) / 60@2x (App)",
-        180: "60@3x (App)",
-        1024: "App Store"
+        40: ["20@2x (Notification)"],
+        60: ["20@3x (Notification)"],
+        58: ["29@2x (Settings)"],
+        87: ["29@3x (Settings)"],
+        80: ["40@2x (Spotlight)"],
+        120: ["40@3x (Spotlight)", "60@2x (App)"],
+        180: ["60@3x (App)"],
+        1024: ["App Store"]
     }
 
-    # Ask user which approach to use
-    print()
-    print("Choose setup method:")
-    print("1) Single Size (iOS 18+) - Recommended, easiest")
-    print("2) Multiple Sizes (iOS 17 and earlier)")
-    print("3) Auto-detect and copy all sizes")
-    if PIL_AVAILABLE:
-        print("4) Generate all sizes from 1024x1024 icon (requires Pillow)")
-    print()
+    mode = args.mode
+    if mode is None:
+        if not sys.stdin.isatty():
+            print_error("No --mode given and stdin is not interactive")
+            sys.exit(1)
 
-    choice = input("Enter choice (1-4): ").strip()
+        # Ask user which approach to use
+        print()
+        print("Choose setup method:")
+        print("1) Single Size (iOS 18+) - Recommended, easiest")
+        print("2) Multiple Sizes (iOS 17 and earlier)")
+        print("3) Auto-detect and copy all sizes")
+        if PIL_AVAILABLE:
+            print("4) Generate all sizes from 1024x1024 icon (requires Pillow)")
+        print()
 
-    if choice == "1":
+        choice = input("Enter choice (1-4): ").strip()
+        mode = MENU_CHOICES.get(choice)
+        if mode == "generate" and not PIL_AVAILABLE:
+            mode = None
+
+    if mode == "single":
         setup_single_size(logo_dir, appicon_dir)
-    elif choice == "2":
+    elif mode == "multi":
         setup_multiple_sizes(logo_dir, appicon_dir, ICON_SIZES)
-    elif choice == "3":
+    elif mode == "auto":
         setup_auto_detect(logo_dir, appicon_dir)
-    elif choice == "4" and PIL_AVAILABLE:
+    elif mode == "generate":
         generate_all_sizes(logo_dir, appicon_dir, ICON_SIZES)
     else:
         print_error("Invalid choice")
@@ -152,7 +221,7 @@ def setup_single_size(logo_dir, appicon_dir):
 
     # Copy icon
     dest_file = appicon_dir / "AppIcon.png"
-    shutil.copy2(source_file, dest_file)
+    shutil.copyfile(source_file, dest_file)
     print_success(f"Copied {source_file.name}")
 
     # Create Contents.json
@@ -172,8 +241,7 @@ def setup_single_size(logo_dir, appicon_dir):
     }
 
     contents_file = appicon_dir / "Contents.json"
-    with open(contents_file, 'w') as f:
-        json.dump(contents, f, indent=2)
+    contents_file.write_text(json.dumps(contents, indent=2))
 
     print_success("Created Contents.json (single size)")
 
@@ -195,18 +263,17 @@ def setup_multiple_sizes(logo_dir, appicon_dir, icon_sizes):
 
         if source_file:
             dest_file = appicon_dir / f"AppIcon-{size}.png"
-            shutil.copy2(source_file, dest_file)
-            print_success(f"Copied {source_file.name} ({icon_sizes[size]})")
+            shutil.copyfile(source_file, dest_file)
+            print_success(f"Copied {source_file.name} ({' / '.join(icon_sizes[size])})")
             copied.append(size)
         else:
-            print_warning(f"Missing icon-{size}.png ({icon_sizes[size]})")
+            print_warning(f"Missing icon-{size}.png ({' / '.join(icon_sizes[size])})")
             missing.append(size)
 
     # Create Contents.json
     contents = create_multi_size_contents()
     contents_file = appicon_dir / "Contents.json"
-    with open(contents_file, 'w') as f:
-        json.dump(contents, f, indent=2)
+    contents_file.write_text(json.dumps(contents, indent=2))
 
     print_success("Created Contents.json (multiple sizes)")
     print()
@@ -222,7 +289,7 @@ def setup_auto_detect(logo_dir, appicon_dir):
     # Copy all PNG files
     count = 0
     for png_file in logo_dir.glob("*.png"):
-        shutil.copy2(png_file, appicon_dir / png_file.name)
+        shutil.copyfile(png_file, appicon_dir / png_file.name)
         count += 1
 
     print_success(f"Copied {count} icon files")
@@ -231,8 +298,7 @@ def setup_auto_detect(logo_dir, appicon_dir):
     if (appicon_dir / "icon-1024.png").exists() or (appicon_dir / "AppIcon-1024.png").exists():
         contents = create_multi_size_contents()
         contents_file = appicon_dir / "Contents.json"
-        with open(contents_file, 'w') as f:
-            json.dump(contents, f, indent=2)
+        contents_file.write_text(json.dumps(contents, indent=2))
         print_success("Created Contents.json")
     else:
         print_warning("You may need to manually adjust Contents.json in Xcode")
@@ -260,10 +326,36 @@ def generate_all_sizes(logo_dir, appicon_dir, icon_sizes):
 
     print_info(f"Using source: {source_file.name}")
 
-    # Open source image
+    cache_file = appicon_dir / ".cache.json"
+    contents_file = appicon_dir / "Contents.json"
+    outputs = [appicon_dir / f"AppIcon-{size}.png" for size in icon_sizes]
+
     try:
+        # With oxipng available, write PNGs quickly and optimize them all at once
+        oxipng = shutil.which("oxipng")
+
+        # Skip regeneration when the source, the pipeline settings and all
+        # outputs are unchanged
+        cache = {
+            "version": CACHE_VERSION,
+            "source_sha256": hashlib.sha256(source_file.read_bytes()).hexdigest(),
+            "sizes": sorted(icon_sizes),
+            "anchors": list(ICON_ANCHORS),
+            "oxipng": bool(oxipng),
+        }
+        cached = read_json(cache_file)
+        if (
+            cached == {**cache, "outputs": file_stats(outputs)}
+            and read_json(contents_file) == create_multi_size_contents()
+        ):
+            print_success("Icons are up to date, skipping generation")
+            return
+
+        # Open source image
         img = Image.open(source_file)
-        
+        # Decode eagerly so later work never touches the lazy file-backed decoder
+        img.load()
+
         # Check if image is 1024x1024
         if img.size != (1024, 1024):
             print_warning(f"Source image is {img.width}x{img.height}, expected 1024x1024")
@@ -274,21 +366,41 @@ def generate_all_sizes(logo_dir, appicon_dir, icon_sizes):
         if img.mode == 'RGBA':
             print_info("Converting RGBA to RGB (removing transparency)")
             rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-            rgb_img.paste(img, mask=img.split()[3])  # Use alpha channel as mask
+            rgb_img.paste(img, mask=img)  # RGBA mask uses the alpha band, no split() copies
             img = rgb_img
 
-        # Generate all sizes
-        for size in icon_sizes.keys():
-            resized = img.resize((size, size), Image.Resampling.LANCZOS)
+        # Generate all sizes, largest first, so each icon is downscaled from the
+        # smallest already generated anchor at least twice its size, keeping
+        # near-equal resamples (e.g. 60 -> 58) out of the chain
+        levels = {}
+        for size in sorted(icon_sizes, reverse=True):
+            anchor = min((a for a in ICON_ANCHORS if a in levels and a >= 2 * size), default=None)
+            base = levels[anchor] if anchor else img
+            levels[size] = downscale(base, size)
+
+        def save_icon(size):
             output_path = appicon_dir / f"AppIcon-{size}.png"
-            resized.save(output_path, 'PNG', optimize=True)
-            print_success(f"Generated AppIcon-{size}.png ({icon_sizes[size]})")
+            if oxipng:
+                levels[size].save(output_path, 'PNG', compress_level=1)
+            else:
+                levels[size].save(output_path, 'PNG', optimize=True)
+            return size
+
+        # Pillow releases the GIL while encoding, so write all sizes concurrently
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for size in executor.map(save_icon, levels):
+                print_success(f"Generated AppIcon-{size}.png ({' / '.join(icon_sizes[size])})")
+
+        if oxipng:
+            print_info("Optimizing generated icons with oxipng...")
+            output_paths = [str(appicon_dir / f"AppIcon-{size}.png") for size in levels]
+            subprocess.run([oxipng, "-o", "4", "--strip", "safe", *output_paths], check=True)
 
         # Create Contents.json
         contents = create_multi_size_contents()
-        contents_file = appicon_dir / "Contents.json"
-        with open(contents_file, 'w') as f:
-            json.dump(contents, f, indent=2)
+        contents_file.write_text(json.dumps(contents, indent=2))
+        cache["outputs"] = file_stats(outputs)
+        cache_file.write_text(json.dumps(cache, indent=2))
 
         print_success("Created Contents.json")
         print()
@@ -298,6 +410,33 @@ def generate_all_sizes(logo_dir, appicon_dir, icon_sizes):
         print_error(f"Error processing image: {e}")
         sys.exit(1)
 
+def read_json(path):
+    """Read a JSON file, returning None if it is missing or invalid"""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+def file_stats(paths):
+    """Map file names to (size, mtime) so replaced files can be detected, None if any is missing"""
+    stats = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        stats[path.name] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+def downscale(img, size):
+    """Downscale a square image to size x size"""
+    if img.width == size:
+        return img
+    if img.width % size == 0 and img.mode in REDUCE_MODES:
+        # Exact integer factor: box-average reduction is much cheaper than LANCZOS
+        return img.reduce(img.width // size)
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
 def create_multi_size_contents():
     """Create Contents.json for multiple sizes"""
     return {